@@ -1,8 +1,9 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean
 from sqlalchemy.orm import declarative_base, sessionmaker
 from datetime import datetime
+import os
 
-DATABASE_URL = "sqlite:///./pdf_data.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./pdf_data.db")
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -18,5 +19,15 @@ class Document(Base):
     pdf_id = Column(String, unique=True, index=True)  # Add this line
 
 
+class StorageUsage(Base):
+    __tablename__ = "storage_usage"
+    id = Column(Integer, primary_key=True, index=True)
+    pdf_id = Column(String, unique=True, index=True)
+    source_bytes = Column(Integer, default=0)  # On-disk size of the PDF (compressed when cold)
+    index_bytes = Column(Integer, default=0)  # On-disk size of the FAISS index (compressed when cold)
+    chunk_bytes = Column(Integer, default=0)  # Size of the extracted text stored in the database
+    compressed = Column(Boolean, default=False)
+    last_accessed = Column(DateTime, default=datetime.utcnow)
+
 
 Base.metadata.create_all(bind=engine)
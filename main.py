@@ -1,14 +1,28 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from routers import pdf_upload, question_answer
+from utils.storage_manager import storage
+
+
+# Run storage garbage collection, compression and quota enforcement in the background
+@asynccontextmanager
+async def lifespan(app: FastAPI) :
+    storage.start()
+    try :
+        yield
+    finally :
+        storage.stop()
+
 
 # Create an instance of the FastAPI application
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Include routers for handling different functionalities
 app.include_router(pdf_upload.router)
 app.include_router(question_answer.router)
 
+
 # Main entry point for the application
 if __name__ == "__main__":
     # Only for development, to run directly
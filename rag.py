@@ -7,6 +7,7 @@ from langchain.prompts import ChatPromptTemplate
 from langchain.schema.output_parser import StrOutputParser  # Updated import
 from langchain.schema.runnable import RunnablePassthrough  # Updated from langchain.runnables
 import os
+from pathlib import Path
 
 class ChatService:
     def __init__(self, pdf_path: str):
@@ -22,7 +23,8 @@ class ChatService:
         self.service = ModelService()
         self.llm = self.service.get_llm_model()
         self.embeddings = self.service.get_embedding_model()
-        self.store_directory = "./vector_store"
+        # Keep one index per document so each can be tracked, compressed and collected on its own
+        self.store_directory = os.path.join("./vector_store", Path(pdf_path).stem)
 
         if not self.llm:
             raise Exception('LLM not found')
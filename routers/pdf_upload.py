@@ -3,9 +3,12 @@ from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from sqlalchemy.orm import Session
 from database import SessionLocal, Document
 from utils.pdf_processor import load_pdf
+from utils.storage_manager import storage
 import uuid
 import os
-from typing import Dict
+import asyncio
+import logging
+from typing import Dict, Union
 from pathlib import Path
 import shutil
 
@@ -17,6 +20,8 @@ class PDFUploadResponse(BaseModel) :
     id: str
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -90,12 +95,6 @@ async def upload_pdf(
             db.commit()
             db.refresh(new_doc)
 
-            return PDFUploadResponse(
-                filename=file.filename,
-                message="PDF successfully uploaded and processed",
-                id=pdf_id
-            )
-
         except Exception as e :
             # Clean up the file if processing fails
             pdf_path.unlink(missing_ok=True)
@@ -104,6 +103,19 @@ async def upload_pdf(
                 detail=f"Error processing PDF: {str(e)}"
             )
 
+        # Start tracking the document's storage footprint; the document is already
+        # committed, so a failure here must not fail the upload
+        try :
+            await asyncio.to_thread(storage.record, pdf_id, True)
+        except Exception as e :
+            logger.error(f"Error recording storage usage for {pdf_id}: {str(e)}")
+
+        return PDFUploadResponse(
+            filename=file.filename,
+            message="PDF successfully uploaded and processed",
+            id=pdf_id
+        )
+
     except Exception as e :
         raise HTTPException(
             status_code=500,
@@ -112,7 +124,7 @@ async def upload_pdf(
 
 
 # Optional: Add endpoint to retrieve PDF status or content
-@router.get("/pdf/{pdf_id}", response_model=Dict[str, str])
+@router.get("/pdf/{pdf_id}", response_model=Dict[str, Union[str, int]])
 async def get_pdf_status(pdf_id: str, db: Session = Depends(get_db)) :
     """
     Get the status or information about an uploaded PDF.
@@ -122,7 +134,7 @@ async def get_pdf_status(pdf_id: str, db: Session = Depends(get_db)) :
         db: Database session dependency
 
     Returns:
-        Dict containing PDF information
+        Dict containing PDF information and its storage footprint in bytes
     """
     doc = db.query(Document).filter(Document.pdf_id == pdf_id).first()
     if not doc :
@@ -131,8 +143,13 @@ async def get_pdf_status(pdf_id: str, db: Session = Depends(get_db)) :
             detail="PDF not found"
         )
 
+    usage = await asyncio.to_thread(storage.usage, pdf_id) or {}
+
     return {
         "filename" : doc.filename,
         "status" : "processed",
-        "id" : doc.pdf_id
+        "id" : doc.pdf_id,
+        "source_bytes" : usage.get("source_bytes", 0),
+        "index_bytes" : usage.get("index_bytes", 0),
+        "chunk_bytes" : usage.get("chunk_bytes", 0)
     }
\ No newline at end of file
@@ -2,7 +2,7 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPExce
 from rag import ChatService
 from sqlalchemy.orm import Session
 from database import SessionLocal, Document
-from pathlib import Path
+from utils.storage_manager import storage
 import logging
 from typing import Dict
 import asyncio
@@ -72,28 +72,32 @@ async def question_answer_ws(
             await websocket.close()
             return
 
-        # Build and verify PDF path
-        upload_dir = Path("E:/FinalProjects/Cyberbear/Askify/upload")
-        pdf_path = upload_dir / f"{document_id}.pdf"
+        # Restore the PDF and its index from cold storage while the chat service loads them
+        async with storage.acheckout(document_id) as pdf_path :
+            if not pdf_path.exists() :
+                await websocket.accept()
+                await websocket.send_text(f"Error: PDF file not found at {pdf_path}")
+                await websocket.close()
+                logger.error(f"PDF file not found: {pdf_path}")
+                return
 
-        if not pdf_path.exists() :
-            await websocket.accept()
-            await websocket.send_text(f"Error: PDF file not found at {pdf_path}")
-            await websocket.close()
-            logger.error(f"PDF file not found: {pdf_path}")
-            return
-
-        # Initialize chat service
-        try :
-            chat_service = ChatService(str(pdf_path))
-            logger.info(f"Chat service initialized for document: {document_id}")
-        except Exception as e :
-            await websocket.accept()
-            error_message = f"Error initializing chat service: {str(e)}"
-            await websocket.send_text(error_message)
-            await websocket.close()
-            logger.error(error_message)
-            return
+            # Initialize chat service
+            try :
+                chat_service = ChatService(str(pdf_path))
+                logger.info(f"Chat service initialized for document: {document_id}")
+            except Exception as e :
+                await websocket.accept()
+                error_message = f"Error initializing chat service: {str(e)}"
+                await websocket.send_text(error_message)
+                await websocket.close()
+                logger.error(error_message)
+                return
+
+            # Only mark the document as recently used once it has loaded successfully
+            try :
+                await asyncio.to_thread(storage.record, document_id, True)
+            except Exception as e :
+                logger.error(f"Error recording storage usage for {document_id}: {str(e)}")
 
         # Connect to WebSocket
         await manager.connect(websocket, client_id)
@@ -2,6 +2,10 @@ import sys
 import os
 import pytest
 import asyncio
+import tempfile
+
+# Keep the module-level engine in database.py away from the tracked pdf_data.db files
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pdf_data.db')}"
 
 askify_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, askify_dir)
@@ -0,0 +1,228 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, Document, StorageUsage
+from utils.storage_manager import StorageManager
+
+PDF_BYTES = b"%PDF-1.4\n" + b"compressible page content\n" * 4000
+INDEX_BYTES = b"\x00\x01\x02\x03" * 4000
+
+
+@pytest.fixture
+def session_factory(tmp_path) :
+    engine = create_engine(f"sqlite:///{tmp_path / 'storage.db'}", connect_args={"check_same_thread" : False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def storage(tmp_path, session_factory) :
+    return StorageManager(
+        upload_dir=tmp_path / "upload",
+        vector_store_dir=tmp_path / "vector_store",
+        session_factory=session_factory,
+        quota_bytes=10 ** 9,
+        cold_after=timedelta(days=1),
+        gc_interval=3600,
+        grace_period=timedelta(hours=1),
+        legacy_paths=(),
+    )
+
+
+def add_document(storage, pdf_id, pdf_bytes=PDF_BYTES, index_bytes=INDEX_BYTES, last_accessed=None) :
+    """Writes a document's PDF and index to disk and registers it in the database."""
+    storage.upload_dir.mkdir(parents=True, exist_ok=True)
+    storage.source_path(pdf_id).write_bytes(pdf_bytes)
+    storage.index_path(pdf_id).mkdir(parents=True, exist_ok=True)
+    (storage.index_path(pdf_id) / "index.faiss").write_bytes(index_bytes)
+    (storage.index_path(pdf_id) / "index.pkl").write_bytes(b"docstore")
+
+    db = storage.session_factory()
+    try :
+        db.add(Document(filename=f"{pdf_id}.pdf", content="extracted text", pdf_id=pdf_id))
+        db.commit()
+    finally :
+        db.close()
+
+    storage.record(pdf_id)
+    if last_accessed :
+        set_last_accessed(storage, pdf_id, last_accessed)
+
+
+def set_last_accessed(storage, pdf_id, last_accessed) :
+    db = storage.session_factory()
+    try :
+        db.query(StorageUsage).filter(StorageUsage.pdf_id == pdf_id).update({"last_accessed" : last_accessed})
+        db.commit()
+    finally :
+        db.close()
+
+
+def make_old(path) :
+    old = time.time() - 2 * 60 * 60
+    os.utime(path, (old, old))
+
+
+def is_cold(storage, pdf_id) :
+    return storage.cold_source_path(pdf_id).exists() and not storage.source_path(pdf_id).exists()
+
+
+def test_collect_garbage_respects_grace_period(storage) :
+    add_document(storage, "kept")
+    orphan_old = storage.upload_dir / "orphan-old.pdf"
+    orphan_new = storage.upload_dir / "orphan-new.pdf"
+    orphan_index = storage.vector_store_dir / "orphan-old"
+    stale_tmp = storage.upload_dir / "kept.pdf.gz.tmp"
+    orphan_old.write_bytes(b"old")
+    orphan_new.write_bytes(b"new")
+    orphan_index.mkdir()
+    stale_tmp.write_bytes(b"partial")
+    for path in (orphan_old, orphan_index, stale_tmp, storage.source_path("kept"), storage.index_path("kept")) :
+        make_old(path)
+
+    freed = storage.collect_garbage()
+
+    assert not orphan_old.exists()
+    assert not orphan_index.exists()
+    assert not stale_tmp.exists()
+    assert orphan_new.exists()
+    assert storage.source_path("kept").exists()
+    assert storage.index_path("kept").exists()
+    assert freed == len(b"old") + len(b"partial")
+
+
+def test_compress_and_rehydrate_round_trip(storage) :
+    add_document(storage, "doc")
+
+    assert storage.compress("doc")
+    assert is_cold(storage, "doc")
+    assert not storage.index_path("doc").exists()
+    assert storage.cold_index_path("doc").exists()
+
+    storage.rehydrate("doc")
+
+    assert storage.source_path("doc").read_bytes() == PDF_BYTES
+    assert (storage.index_path("doc") / "index.faiss").read_bytes() == INDEX_BYTES
+    assert (storage.index_path("doc") / "index.pkl").read_bytes() == b"docstore"
+    assert not storage.cold_source_path("doc").exists()
+    assert not storage.cold_index_path("doc").exists()
+
+
+def test_compress_skips_pinned_document(storage) :
+    add_document(storage, "doc")
+
+    with storage.checkout("doc") as pdf_path :
+        assert not storage.compress("doc")
+        assert not storage.evict_index("doc")
+        assert pdf_path.read_bytes() == PDF_BYTES
+
+    assert storage.compress("doc")
+
+
+def test_enforce_quota_compresses_in_lru_order(storage) :
+    now = datetime.utcnow()
+    add_document(storage, "oldest", last_accessed=now - timedelta(hours=3))
+    add_document(storage, "middle", last_accessed=now - timedelta(hours=2))
+    add_document(storage, "newest", last_accessed=now - timedelta(hours=1))
+    document_bytes = sum(storage._disk_usage("newest")[:2])
+    storage.quota_bytes = 2 * document_bytes + document_bytes // 2
+
+    total = storage.enforce_quota()
+
+    assert total <= storage.quota_bytes
+    assert is_cold(storage, "oldest")
+    assert not is_cold(storage, "middle")
+    assert not is_cold(storage, "newest")
+
+
+def test_enforce_quota_evicts_indexes_when_compression_is_not_enough(storage) :
+    now = datetime.utcnow()
+    # Random bytes do not compress, like real PDFs and FAISS vectors
+    add_document(storage, "oldest", pdf_bytes=os.urandom(20000), index_bytes=os.urandom(20000),
+                 last_accessed=now - timedelta(hours=2))
+    add_document(storage, "newest", pdf_bytes=os.urandom(20000), index_bytes=os.urandom(20000),
+                 last_accessed=now - timedelta(hours=1))
+    storage.quota_bytes = 70000
+
+    total = storage.enforce_quota()
+
+    assert total <= storage.quota_bytes
+    assert storage._disk_usage("oldest")[1] == 0
+    assert storage.index_path("newest").exists()
+    assert not storage.cold_index_path("newest").exists()
+    assert not is_cold(storage, "newest")
+    # Archives that would not shrink the file are discarded
+    assert storage.source_path("oldest").exists()
+    assert not storage.cold_source_path("oldest").exists()
+
+
+def test_demote_cold_honours_cold_after(storage) :
+    now = datetime.utcnow()
+    add_document(storage, "idle", last_accessed=now - timedelta(days=2))
+    add_document(storage, "recent", last_accessed=now - timedelta(hours=1))
+
+    assert storage.demote_cold() == 1
+    assert is_cold(storage, "idle")
+    assert not is_cold(storage, "recent")
+
+
+def test_record_retries_when_a_concurrent_insert_wins(storage) :
+    add_document(storage, "doc")
+    session_factory = storage.session_factory
+    db = session_factory()
+    try :
+        db.query(StorageUsage).filter(StorageUsage.pdf_id == "doc").delete()
+        db.commit()
+    finally :
+        db.close()
+
+    raced = []
+
+    def racing_session_factory() :
+        # Insert the row from another session just before the first one flushes its own insert
+        session = session_factory()
+
+        @event.listens_for(session, "before_flush")
+        def insert_first(*args) :
+            if raced :
+                return
+            raced.append(True)
+            other = session_factory()
+            try :
+                other.add(StorageUsage(pdf_id="doc", last_accessed=datetime.utcnow()))
+                other.commit()
+            finally :
+                other.close()
+
+        return session
+
+    storage.session_factory = racing_session_factory
+    storage.record("doc")
+    storage.session_factory = session_factory
+
+    assert raced
+    assert storage.usage("doc")["source_bytes"] == len(PDF_BYTES)
+
+
+def test_run_cycle_continues_after_a_failed_record(storage, monkeypatch) :
+    add_document(storage, "doc")
+    orphan = storage.upload_dir / "orphan.pdf"
+    orphan.write_bytes(b"orphan")
+    make_old(orphan)
+    record = storage.record
+
+    def failing_record(pdf_id, touch=False) :
+        if pdf_id == "doc" :
+            raise RuntimeError("database is locked")
+        record(pdf_id, touch)
+
+    monkeypatch.setattr(storage, "record", failing_record)
+    storage.run_cycle()
+
+    assert not orphan.exists()
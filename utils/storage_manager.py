@@ -0,0 +1,501 @@
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import tarfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal, Document, StorageUsage
+
+"""
+This module provides a `StorageManager` that bounds the disk footprint of uploaded PDFs and their indexes.
+
+Every document owns a source PDF in `upload/<pdf_id>.pdf` and a FAISS index in `vector_store/<pdf_id>/`.
+The manager tracks their sizes per document, removes files that no `Document` row references,
+compresses documents that have not been opened recently, and decompresses them again on access.
+When compression alone cannot keep the footprint within the quota, the indexes of the least-recently-used
+documents are deleted; `ChatService` rebuilds a missing index from the PDF the next time it is opened.
+Source PDFs are never evicted because they are the only copy of the document.
+"""
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path("upload")
+VECTOR_STORE_DIR = Path("vector_store")
+
+# Stores left behind by earlier versions of the service that nothing reads any more
+LEGACY_PATHS = (Path("chroma_db"),)
+
+SOURCE_SUFFIX = ".pdf"
+COLD_SOURCE_SUFFIX = ".pdf.gz"
+COLD_INDEX_SUFFIX = ".tar.gz"
+TMP_SUFFIX = ".tmp"
+
+# Level 1 trades a little ratio for much faster compression and decompression
+COMPRESS_LEVEL = 1
+
+
+def _path_size(path: Path) -> int:
+    """
+    Returns the number of bytes a file or directory occupies, or 0 if it does not exist.
+    """
+    if path.is_file():
+        return path.stat().st_size
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return 0
+
+
+def _remove_path(path: Path) -> None:
+    """
+    Deletes a file or directory tree if it exists.
+    """
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def _keep_if_smaller(tmp: Path, compressed: Path, original: Path) -> None:
+    """
+    Replaces `original` with the freshly written `tmp` archive only if it saves space.
+    """
+    if _path_size(tmp) < _path_size(original):
+        os.replace(tmp, compressed)
+        _remove_path(original)
+    else:
+        tmp.unlink(missing_ok=True)
+
+
+class StorageManager:
+    """
+    This class manages the lifecycle of stored PDFs and vector indexes.
+    It tracks bytes per document, garbage-collects unreferenced files, and demotes
+    least-recently-used documents to compressed cold storage to respect a disk quota.
+    """
+
+    def __init__(
+            self,
+            upload_dir: Path = UPLOAD_DIR,
+            vector_store_dir: Path = VECTOR_STORE_DIR,
+            session_factory=SessionLocal,
+            quota_bytes: Optional[int] = None,
+            cold_after: Optional[timedelta] = None,
+            gc_interval: Optional[float] = None,
+            grace_period: timedelta = timedelta(hours=1),
+            legacy_paths: Iterable[Path] = LEGACY_PATHS,
+    ):
+        """
+        Initializes the manager with storage locations and lifecycle settings.
+
+        Args:
+            upload_dir (Path): Directory holding the uploaded PDFs.
+            vector_store_dir (Path): Directory holding one FAISS index per document.
+            session_factory: Callable returning a database session.
+            quota_bytes (int, optional): Disk budget for sources and indexes.
+                Defaults to the ASKIFY_STORAGE_QUOTA_BYTES environment variable, or 1 GiB.
+            cold_after (timedelta, optional): Idle time after which a document is compressed.
+                Defaults to the ASKIFY_COLD_AFTER_HOURS environment variable, or 7 days.
+            gc_interval (float, optional): Seconds between background cycles.
+                Defaults to the ASKIFY_GC_INTERVAL_SECONDS environment variable, or 1 hour.
+            grace_period (timedelta): Minimum age of an unreferenced file before it is deleted,
+                so uploads that have not been committed yet are left alone.
+            legacy_paths (Iterable[Path]): Unused stores of earlier versions to delete during garbage collection.
+        """
+        # Load environment variables from a .env file
+        load_dotenv()
+
+        self.upload_dir = Path(upload_dir)
+        self.vector_store_dir = Path(vector_store_dir)
+        self.session_factory = session_factory
+        self.quota_bytes = quota_bytes if quota_bytes is not None else int(
+            os.getenv("ASKIFY_STORAGE_QUOTA_BYTES", 1024 ** 3)
+        )
+        self.cold_after = cold_after if cold_after is not None else timedelta(
+            hours=float(os.getenv("ASKIFY_COLD_AFTER_HOURS", 24 * 7))
+        )
+        self.gc_interval = gc_interval if gc_interval is not None else float(
+            os.getenv("ASKIFY_GC_INTERVAL_SECONDS", 60 * 60)
+        )
+        self.grace_period = grace_period
+        self.legacy_paths = tuple(Path(path) for path in legacy_paths)
+
+        self._lock = threading.RLock()
+        self._pinned: Dict[str, int] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------------
+
+    def source_path(self, pdf_id: str) -> Path:
+        return self.upload_dir / f"{pdf_id}{SOURCE_SUFFIX}"
+
+    def cold_source_path(self, pdf_id: str) -> Path:
+        return self.upload_dir / f"{pdf_id}{COLD_SOURCE_SUFFIX}"
+
+    def index_path(self, pdf_id: str) -> Path:
+        return self.vector_store_dir / pdf_id
+
+    def cold_index_path(self, pdf_id: str) -> Path:
+        return self.vector_store_dir / f"{pdf_id}{COLD_INDEX_SUFFIX}"
+
+    # ------------------------------------------------------------------
+    # Accounting
+    # ------------------------------------------------------------------
+
+    def _disk_usage(self, pdf_id: str) -> Tuple[int, int, bool]:
+        """
+        Measures the current on-disk footprint of a document.
+
+        Returns:
+            tuple: (source bytes, index bytes, whether anything is in cold storage)
+        """
+        cold_source = self.cold_source_path(pdf_id)
+        cold_index = self.cold_index_path(pdf_id)
+        source_bytes = _path_size(self.source_path(pdf_id)) + _path_size(cold_source)
+        index_bytes = _path_size(self.index_path(pdf_id)) + _path_size(cold_index)
+        return source_bytes, index_bytes, cold_source.exists() or cold_index.exists()
+
+    def record(self, pdf_id: str, touch: bool = False) -> None:
+        """
+        Refreshes the stored byte counts of a document.
+
+        Args:
+            pdf_id (str): The UUID of the document.
+            touch (bool): Also mark the document as just accessed.
+        """
+        source_bytes, index_bytes, compressed = self._disk_usage(pdf_id)
+
+        # Another thread may insert the row between our read and insert; retry once as an update
+        for attempt in range(2):
+            db = self.session_factory()
+            try:
+                usage = db.query(StorageUsage).filter(StorageUsage.pdf_id == pdf_id).first()
+                if not usage:
+                    usage = StorageUsage(pdf_id=pdf_id, last_accessed=datetime.utcnow())
+                    db.add(usage)
+                document = db.query(Document).filter(Document.pdf_id == pdf_id).first()
+                usage.chunk_bytes = len(document.content.encode("utf-8")) if document and document.content else 0
+                usage.source_bytes = source_bytes
+                usage.index_bytes = index_bytes
+                usage.compressed = compressed
+                if touch:
+                    usage.last_accessed = datetime.utcnow()
+                db.commit()
+                return
+            except IntegrityError:
+                db.rollback()
+                if attempt:
+                    raise
+            finally:
+                db.close()
+
+    def usage(self, pdf_id: str) -> Optional[Dict[str, int]]:
+        """
+        Returns the tracked byte counts of a document, or None if it is not tracked.
+        """
+        db = self.session_factory()
+        try:
+            usage = db.query(StorageUsage).filter(StorageUsage.pdf_id == pdf_id).first()
+            if not usage:
+                return None
+            return {
+                "source_bytes": usage.source_bytes,
+                "index_bytes": usage.index_bytes,
+                "chunk_bytes": usage.chunk_bytes,
+            }
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Hot / cold transitions
+    # ------------------------------------------------------------------
+
+    def compress(self, pdf_id: str) -> bool:
+        """
+        Moves a document's source PDF and index into compressed cold storage.
+        A file whose archive would not be smaller than the original is left as it is.
+
+        Returns:
+            bool: False if the document is in use and was left untouched.
+        """
+        with self._lock:
+            if self._pinned.get(pdf_id):
+                return False
+
+            source = self.source_path(pdf_id)
+            if source.exists():
+                tmp = self.cold_source_path(pdf_id).with_name(self.cold_source_path(pdf_id).name + TMP_SUFFIX)
+                with source.open("rb") as src, gzip.open(tmp, "wb", compresslevel=COMPRESS_LEVEL) as dst:
+                    shutil.copyfileobj(src, dst)
+                _keep_if_smaller(tmp, self.cold_source_path(pdf_id), source)
+
+            index = self.index_path(pdf_id)
+            if index.is_dir():
+                tmp = self.cold_index_path(pdf_id).with_name(self.cold_index_path(pdf_id).name + TMP_SUFFIX)
+                with tarfile.open(tmp, "w:gz", compresslevel=COMPRESS_LEVEL) as archive:
+                    archive.add(index, arcname=".")
+                _keep_if_smaller(tmp, self.cold_index_path(pdf_id), index)
+
+            self.record(pdf_id)
+            return True
+
+    def rehydrate(self, pdf_id: str) -> None:
+        """
+        Restores a document's source PDF and index from cold storage, if they were compressed.
+        """
+        with self._lock:
+            cold_source = self.cold_source_path(pdf_id)
+            if cold_source.exists() and not self.source_path(pdf_id).exists():
+                tmp = self.source_path(pdf_id).with_name(self.source_path(pdf_id).name + TMP_SUFFIX)
+                with gzip.open(cold_source, "rb") as src, tmp.open("wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp, self.source_path(pdf_id))
+            cold_source.unlink(missing_ok=True)
+
+            cold_index = self.cold_index_path(pdf_id)
+            if cold_index.exists() and not self.index_path(pdf_id).exists():
+                tmp = self.index_path(pdf_id).with_name(self.index_path(pdf_id).name + TMP_SUFFIX)
+                _remove_path(tmp)
+                with tarfile.open(cold_index, "r:gz") as archive:
+                    if hasattr(tarfile, "data_filter"):
+                        archive.extractall(tmp, filter="data")
+                    else:
+                        archive.extractall(tmp)
+                os.replace(tmp, self.index_path(pdf_id))
+            cold_index.unlink(missing_ok=True)
+
+    def evict_index(self, pdf_id: str) -> bool:
+        """
+        Deletes a document's index, hot or cold. It is rebuilt from the source PDF on next use.
+
+        Returns:
+            bool: False if the document is in use and was left untouched.
+        """
+        with self._lock:
+            if self._pinned.get(pdf_id):
+                return False
+
+            _remove_path(self.index_path(pdf_id))
+            _remove_path(self.cold_index_path(pdf_id))
+            self.record(pdf_id)
+            return True
+
+    def _pin(self, pdf_id: str) -> None:
+        with self._lock:
+            self._pinned[pdf_id] = self._pinned.get(pdf_id, 0) + 1
+
+    def _unpin(self, pdf_id: str) -> None:
+        with self._lock:
+            self._pinned[pdf_id] -= 1
+            if not self._pinned[pdf_id]:
+                del self._pinned[pdf_id]
+
+    @contextmanager
+    def checkout(self, pdf_id: str) -> Iterator[Path]:
+        """
+        Makes a document hot for the duration of the block and protects it from demotion.
+        Callers mark the document as accessed with `record(pdf_id, touch=True)` once it loaded successfully.
+
+        Args:
+            pdf_id (str): The UUID of the document.
+
+        Yields:
+            Path: The path of the decompressed source PDF.
+        """
+        self._pin(pdf_id)
+        try:
+            self.rehydrate(pdf_id)
+            yield self.source_path(pdf_id)
+        finally:
+            self._unpin(pdf_id)
+
+    @asynccontextmanager
+    async def acheckout(self, pdf_id: str) -> AsyncIterator[Path]:
+        """
+        Async variant of `checkout` that takes the lock and decompresses in a worker thread,
+        so a long compression in the background worker does not stall the event loop.
+        """
+        await asyncio.to_thread(self._pin, pdf_id)
+        try:
+            await asyncio.to_thread(self.rehydrate, pdf_id)
+            yield self.source_path(pdf_id)
+        finally:
+            await asyncio.to_thread(self._unpin, pdf_id)
+
+    # ------------------------------------------------------------------
+    # Lifecycle passes
+    # ------------------------------------------------------------------
+
+    def _referenced_ids(self) -> Set[str]:
+        db = self.session_factory()
+        try:
+            return {pdf_id for (pdf_id,) in db.query(Document.pdf_id).all() if pdf_id}
+        finally:
+            db.close()
+
+    def collect_garbage(self) -> int:
+        """
+        Deletes sources, indexes and usage rows that no `Document` row references,
+        along with the stores of earlier versions of the service.
+
+        Returns:
+            int: The number of bytes freed.
+        """
+        referenced = self._referenced_ids()
+        cutoff = time.time() - self.grace_period.total_seconds()
+        freed = 0
+
+        with self._lock:
+            for directory in (self.upload_dir, self.vector_store_dir):
+                if not directory.is_dir():
+                    continue
+                for entry in directory.iterdir():
+                    pdf_id = entry.name.split(".")[0]
+                    stale_tmp = entry.name.endswith(TMP_SUFFIX) and pdf_id not in self._pinned
+                    if pdf_id in referenced and not stale_tmp:
+                        continue
+                    if entry.stat().st_mtime > cutoff:
+                        continue
+                    size = _path_size(entry)
+                    _remove_path(entry)
+                    freed += size
+                    logger.info(f"Garbage collected {entry} ({size} bytes)")
+
+            for legacy in self.legacy_paths:
+                if legacy.exists():
+                    size = _path_size(legacy)
+                    _remove_path(legacy)
+                    freed += size
+                    logger.info(f"Removed unused store {legacy} ({size} bytes)")
+
+        db = self.session_factory()
+        try:
+            db.query(StorageUsage).filter(StorageUsage.pdf_id.notin_(referenced)).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+        return freed
+
+    def demote_cold(self) -> int:
+        """
+        Compresses every document that has not been accessed within `cold_after`.
+
+        Returns:
+            int: The number of documents with at least one file in cold storage afterwards.
+        """
+        cutoff = datetime.utcnow() - self.cold_after
+        db = self.session_factory()
+        try:
+            idle = [
+                pdf_id for (pdf_id,) in db.query(StorageUsage.pdf_id)
+                .filter(StorageUsage.compressed.is_(False), StorageUsage.last_accessed < cutoff)
+                .all()
+            ]
+        finally:
+            db.close()
+
+        return sum(1 for pdf_id in idle if self.compress(pdf_id) and self._disk_usage(pdf_id)[2])
+
+    def enforce_quota(self) -> int:
+        """
+        Demotes documents oldest first until the footprint fits within `quota_bytes`.
+        Each document is compressed and, if the quota is still exceeded, its index is deleted
+        before any more recently used document is touched. Evicted indexes are rebuilt from
+        the PDF on next use.
+
+        Returns:
+            int: The total on-disk footprint after enforcement.
+        """
+        db = self.session_factory()
+        try:
+            by_recency = [
+                pdf_id for (pdf_id,) in db.query(StorageUsage.pdf_id)
+                .order_by(StorageUsage.last_accessed.asc())
+                .all()
+            ]
+        finally:
+            db.close()
+
+        total = sum(sum(self._disk_usage(pdf_id)[:2]) for pdf_id in by_recency)
+
+        for pdf_id in by_recency:
+            if total <= self.quota_bytes:
+                break
+
+            before = sum(self._disk_usage(pdf_id)[:2])
+            if not self.compress(pdf_id):
+                continue  # In use
+            total -= before - sum(self._disk_usage(pdf_id)[:2])
+
+            # PDFs and FAISS vectors barely shrink under gzip, so fall back to evicting the index
+            index_bytes = self._disk_usage(pdf_id)[1]
+            if total > self.quota_bytes and index_bytes and self.evict_index(pdf_id):
+                total -= index_bytes
+                logger.info(f"Evicted index of {pdf_id} ({index_bytes} bytes) to stay within quota")
+
+        if total > self.quota_bytes:
+            logger.warning(f"Storage footprint {total} bytes exceeds quota of {self.quota_bytes} bytes")
+        return total
+
+    def run_cycle(self) -> None:
+        """
+        Runs one garbage collection, cold demotion and quota enforcement pass.
+        """
+        referenced = self._referenced_ids()
+        for pdf_id in referenced:
+            try:
+                self.record(pdf_id)
+            except Exception as e:
+                logger.error(f"Error recording storage usage for {pdf_id}: {str(e)}")
+
+        freed = self.collect_garbage()
+        demoted = self.demote_cold()
+        total = self.enforce_quota()
+        logger.info(f"Storage cycle finished: freed {freed} bytes, compressed {demoted} idle documents, "
+                    f"footprint {total} bytes")
+
+    # ------------------------------------------------------------------
+    # Background worker
+    # ------------------------------------------------------------------
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.gc_interval):
+            try:
+                self.run_cycle()
+            except Exception as e:
+                logger.error(f"Error during storage cycle: {str(e)}")
+
+    def start(self) -> None:
+        """
+        Starts the background lifecycle worker if it is not already running.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="storage-manager", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the background lifecycle worker.
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+
+storage = StorageManager()